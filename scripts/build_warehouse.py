@@ -0,0 +1,84 @@
+"""
+Build the combined DuckDB database directly from the Excel sources.
+
+Loads transactions and trial balances into one database over a single
+connection, without writing the intermediate per-source databases.
+"""
+
+import sys
+from pathlib import Path
+
+from process_dump import load_transactions
+from transform_trial_balances import create_views, load_trial_balances
+from utils import open_duckdb
+
+
+def build_warehouse(
+    transactions_path: str = "import/DUMP_13jun25.xls",
+    trial_balances_path: str = "import/2025_BalansenWinstverliesperperiode.xlsx",
+    output_db: str = "export/combined.db",
+) -> None:
+    """
+    Build the combined database from both Excel sources in one transaction.
+
+    Produces the same tables and views as running process_dump,
+    transform_trial_balances and combine_databases in sequence, but opens
+    the output database once and skips the copy step entirely.
+
+    Args:
+        transactions_path: Path to the transaction dump Excel file.
+            Default: "import/DUMP_13jun25.xls"
+        trial_balances_path: Path to the trial balance Excel file.
+            Default: "import/2025_BalansenWinstverliesperperiode.xlsx"
+        output_db: Path to the combined output database.
+            Default: "export/combined.db"
+            Existing tables and views are replaced.
+
+    Raises:
+        FileNotFoundError: If an input Excel file doesn't exist.
+        Exception: If loading fails; nothing is committed in that case.
+
+    Example:
+        >>> build_warehouse()
+        Building export/combined.db...
+        ...
+        ✓ Combined database created: export/combined.db
+          Tables: 2
+          Views: 1
+          Total rows: 9,163
+    """
+    print(f"Building {output_db}...")
+
+    with open_duckdb(output_db) as con:
+        con.begin()
+
+        print(f"\nProcessing {transactions_path}...")
+        transaction_count = load_transactions(con, transactions_path)
+
+        print(f"\nLoading trial balances from {trial_balances_path}...")
+        trial_balance_count = load_trial_balances(con, Path(trial_balances_path))
+
+        print("\nCreating views...")
+        create_views(con)
+
+        con.commit()
+
+    total_rows = transaction_count + trial_balance_count
+    print(f"\n✓ Combined database created: {output_db}")
+    print("  Tables: 2")
+    print("  Views: 1")
+    print(f"  Total rows: {total_rows:,}")
+
+
+def main() -> int:
+    """CLI entry point."""
+    try:
+        build_warehouse()
+        return 0
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,7 @@ Merges transactions and trial balances databases for unified analysis.
 import sys
 from pathlib import Path
 
-import duckdb
+from utils import connect_duckdb, estimated_row_count
 
 
 def combine_databases(
@@ -18,16 +18,19 @@ def combine_databases(
     """
     Combine multiple DuckDB databases into a single unified database.
 
-    Creates a new database containing all tables from source databases.
-    Uses DuckDB's ATTACH mechanism to efficiently copy tables without
-    loading data into memory.
+    Creates a new database containing every object from the source databases.
+    Uses DuckDB's ATTACH mechanism and COPY FROM DATABASE, which recreates
+    each table, view and other catalog object of a source in the output
+    database and then fills the tables with INSERT ... SELECT. This includes
+    vw_UniqueAccountCodes from a trial balances database written by
+    transform_trial_balances.
 
     Process:
     1. Create new combined database
-    2. ATTACH source databases
-    3. Copy tables using CREATE TABLE AS SELECT
-    4. DETACH source databases
-    5. Verify row counts
+    2. ATTACH source databases (read-only)
+    3. Copy all tables and views of each source using COPY FROM DATABASE
+    4. Read estimated row counts from the source catalogs
+    5. DETACH source databases
 
     Args:
         transactions_db: Path to database containing 'transactions' table.
@@ -46,12 +49,12 @@ def combine_databases(
         >>> combine_databases()
         Combining databases into export/combined.db...
           Copying transactions table...
-            ✓ Copied 7,388 rows
+            ✓ Copied ~7,388 rows (catalog estimate)
           Copying fct_TrialBalances table...
-            ✓ Copied 1,775 rows
+            ✓ Copied ~1,775 rows (catalog estimate)
         ✓ Combined database created: export/combined.db
           Tables: 2
-          Total rows: 9,163
+          Total rows: ~9,163 (catalog estimate)
 
     Note:
         Source databases are not modified. A new database is created.
@@ -62,25 +65,29 @@ def combine_databases(
     Path(output_db).parent.mkdir(parents=True, exist_ok=True)
 
     # Create a new combined database
-    con = duckdb.connect(output_db)
+    con = connect_duckdb(output_db)
+
+    # COPY FROM DATABASE needs the catalog name of the output database
+    target = con.execute("SELECT current_database()").fetchone()[0]
 
     # Attach and copy from transactions database
     print("  Copying transactions table...")
-    con.execute(f"ATTACH '{transactions_db}' AS source1")
-    con.execute("CREATE TABLE transactions AS SELECT * FROM source1.transactions")
+    con.execute(f"ATTACH '{transactions_db}' AS source1 (READ_ONLY)")
+    con.execute(f'COPY FROM DATABASE source1 TO "{target}"')
+    # Catalog estimates avoid scanning the copied tables; see estimated_row_count()
+    transaction_count = estimated_row_count(con, "transactions", "source1")
     con.execute("DETACH source1")
-    transaction_count = con.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
-    print(f"    ✓ Copied {transaction_count:,} rows")
+    print(f"    ✓ Copied ~{transaction_count:,} rows (catalog estimate)")
 
     # Attach and copy from trial balances database
     print("  Copying fct_TrialBalances table...")
-    con.execute(f"ATTACH '{trial_balances_db}' AS source2")
-    con.execute("CREATE TABLE fct_TrialBalances AS SELECT * FROM source2.fct_TrialBalances")
+    con.execute(f"ATTACH '{trial_balances_db}' AS source2 (READ_ONLY)")
+    con.execute(f'COPY FROM DATABASE source2 TO "{target}"')
+    trial_balance_count = estimated_row_count(con, "fct_TrialBalances", "source2")
     con.execute("DETACH source2")
-    trial_balance_count = con.execute("SELECT COUNT(*) FROM fct_TrialBalances").fetchone()[0]
-    print(f"    ✓ Copied {trial_balance_count:,} rows")
+    print(f"    ✓ Copied ~{trial_balance_count:,} rows (catalog estimate)")
 
-    # Create views for common queries
+    # Recreate the views so they exist even if a source database lacks them
     print("  Creating views...")
     con.execute("""
         CREATE OR REPLACE VIEW vw_UniqueAccountCodes AS
@@ -98,7 +105,7 @@ def combine_databases(
     print(f"\n✓ Combined database created: {output_db}")
     print(f"  Tables: 2")
     print(f"  Views: 1")
-    print(f"  Total rows: {total_rows:,}")
+    print(f"  Total rows: ~{total_rows:,} (catalog estimate)")
 
 
 def main() -> int:
@@ -1,7 +1,7 @@
 """
 Process transaction dump from Excel to DuckDB.
 
-Transforms Excel transaction data by:
+Streams Excel transaction data into DuckDB in chunks, transforming it by:
 - Removing unnecessary columns
 - Converting date formats
 - Padding account codes
@@ -9,40 +9,92 @@ Transforms Excel transaction data by:
 """
 
 import sys
-from pathlib import Path
 
-import pandas as pd
+import duckdb
 
-from utils import pad_account_code, apply_schema, validate_schema, write_to_duckdb
+from utils import iter_excel_chunks, open_duckdb, pad_account_code_sql
 
-# Column names to remove from the dump
-COLUMNS_TO_DROP = [
-    "Btwbedrag",
-    "Boekingsstatus",
-    "CodeAdministratie",
-    "Code2",
-    "Debet",
-    "Credit",
-    "Btwcode",
-    "Nummer",
-]
+# Rows per chunk when streaming the dump into DuckDB
+CHUNK_SIZE = 50_000
 
-# Expected schema for transactions table
+# Expected schema for transactions table (DuckDB types).
+# Columns not listed here (Btwbedrag, Boekingsstatus, CodeAdministratie, Code2,
+# Debet, Credit, Btwcode, Nummer) are dropped from the dump.
 TRANSACTIONS_SCHEMA = {
-    "NaamAdministratie": "str",
-    "CodeGrootboekrekening": "str",  # String for padded codes
-    "NaamGrootboekrekening": "str",
-    "Code": "str",
-    "Boekingsnummer": "Int64",  # Nullable integer
-    "Boekdatum": "datetime64[ns]",
-    "Periode": "str",
-    "Code1": "str",
-    "Omschrijving": "str",
-    "Saldo": "float64",
-    "Factuurnummer": "str",
+    "NaamAdministratie": "VARCHAR",
+    "CodeGrootboekrekening": "VARCHAR",  # String for padded codes
+    "NaamGrootboekrekening": "VARCHAR",
+    "Code": "VARCHAR",
+    "Boekingsnummer": "BIGINT",  # Nullable integer
+    "Boekdatum": "TIMESTAMP",
+    "Periode": "VARCHAR",
+    "Code1": "VARCHAR",
+    "Omschrijving": "VARCHAR",
+    "Saldo": "DOUBLE",
+    "Factuurnummer": "VARCHAR",
 }
 
 
+def build_transactions_query(source: str) -> str:
+    """
+    Build the SELECT that turns raw dump rows into the transactions table.
+
+    Column selection, date conversion, account code padding and type casts
+    all happen in this one DuckDB query, so the dump is never mutated in pandas.
+
+    Args:
+        source: Name of the table or registered view holding the raw dump.
+
+    Returns:
+        SQL SELECT statement producing columns in TRANSACTIONS_SCHEMA order.
+    """
+    expressions = []
+    for col, sql_type in TRANSACTIONS_SCHEMA.items():
+        if col == "CodeGrootboekrekening":
+            # Pad to 4 positions with leading zeros
+            expr = pad_account_code_sql(f'"{col}"')
+        elif col == "Boekdatum":
+            # Dump stores dates as timestamp milliseconds
+            expr = f'CAST(epoch_ms(TRY_CAST("{col}" AS BIGINT)) AS {sql_type})'
+        else:
+            expr = f'TRY_CAST("{col}" AS {sql_type})'
+        expressions.append(f'{expr} AS "{col}"')
+
+    return f"SELECT {', '.join(expressions)} FROM {source}"
+
+
+def load_transactions(con: duckdb.DuckDBPyConnection, input_path: str) -> int:
+    """
+    Create the transactions table on an open connection and stream the dump into it.
+
+    No transaction is opened here, so callers can combine this load with
+    other writes in one transaction.
+
+    Args:
+        con: Open DuckDB connection to write to.
+        input_path: Path to input Excel file
+
+    Returns:
+        Number of rows loaded.
+    """
+    columns = ", ".join(f'"{col}" {sql_type}' for col, sql_type in TRANSACTIONS_SCHEMA.items())
+    query = build_transactions_query("dump_chunk")
+
+    con.execute(f"CREATE OR REPLACE TABLE transactions ({columns})")
+
+    # Stream the dump in chunks; only columns in the schema are read.
+    # Drop columns, convert dates, pad codes and apply schema per chunk.
+    print(f"  Streaming into DuckDB in chunks of {CHUNK_SIZE:,} rows...")
+    loaded = 0
+    for chunk in iter_excel_chunks(input_path, list(TRANSACTIONS_SCHEMA), CHUNK_SIZE):
+        con.register("dump_chunk", chunk)
+        loaded += con.execute(f"INSERT INTO transactions {query}").fetchone()[0]
+        con.unregister("dump_chunk")
+
+    print(f"  Loaded: {loaded:,} rows, {len(TRANSACTIONS_SCHEMA)} columns")
+    return loaded
+
+
 def process_dump(
     input_path: str = "import/DUMP_13jun25.xls",
     output_path: str = "export/2023_transactions.db",
@@ -56,36 +108,16 @@ def process_dump(
     """
     print(f"Processing {input_path}...")
 
-    # Read the Excel file
-    df = pd.read_excel(input_path)
-
-    print(f"  Loaded: {len(df):,} rows, {len(df.columns)} columns")
-
-    # Delete specified columns
-    df = df.drop(columns=COLUMNS_TO_DROP)
-
-    # Convert Boekdatum to proper datetime type (from timestamp milliseconds)
-    df["Boekdatum"] = pd.to_datetime(df["Boekdatum"], unit="ms")
-
-    # Pad CodeGrootboekrekening to 4 positions with leading zeros
-    df["CodeGrootboekrekening"] = pad_account_code(df["CodeGrootboekrekening"])
-
-    # Apply explicit schema to ensure correct types
-    print("  Applying schema...")
-    df = apply_schema(df, TRANSACTIONS_SCHEMA)
-
-    print(f"  Final schema:")
-    print(df.dtypes)
-
-    # Validate schema before writing
-    if not validate_schema(df, TRANSACTIONS_SCHEMA):
-        print("  Warning: Schema validation found issues, but continuing...")
+    with open_duckdb(output_path) as con:
+        con.begin()
+        loaded = load_transactions(con, input_path)
+        con.commit()
 
-    # Write to DuckDB using shared utility
-    row_count = write_to_duckdb(df, output_path, "transactions", if_exists="replace")
+        print("  Final schema:")
+        print(con.sql("DESCRIBE transactions").project("column_name, column_type"))
 
     print(f"  ✓ Written to: {output_path}")
-    print(f"  ✓ Verified: {row_count:,} rows in transactions table")
+    print(f"  ✓ Verified: {loaded:,} rows in transactions table")
 
 
 def main() -> int:
@@ -3,12 +3,18 @@ Transform Excel trial balance data to DuckDB database.
 Replicates the Power Query logic from fac_TrialBalances.m
 """
 
-import pandas as pd
-from pathlib import Path
-from datetime import date
 import calendar
-from utils import pad_account_code, apply_schema, validate_schema, write_to_duckdb
+import re
+from datetime import date
+from functools import cache
+from pathlib import Path
 
+import duckdb
+
+from utils import iter_excel_chunks, open_duckdb, pad_account_code_sql
+
+# Rows per chunk when reading the trial balance sheet
+CHUNK_SIZE = 50_000
 
 # Mapping Dutch month names to month numbers
 MONTH_MAP = {
@@ -17,20 +23,38 @@ MONTH_MAP = {
     "september": 9, "oktober": 10, "november": 11, "december": 12,
 }
 
+# Period column names: opening balance or Dutch month name followed by the year
+PERIOD_PATTERN = re.compile(
+    rf"^(openingsbalans|{'|'.join(MONTH_MAP)})(\d{{4}})$",
+    re.IGNORECASE,
+)
+
+
+# ID columns to keep
+ID_COLUMNS = [
+    "CodeGrootboekrekening",
+    "NaamAdministratie",
+    "CodeRelatiekostenplaats",
+    "NaamRelatiekostenplaats",
+    "CodeDimensietype",  # This becomes Code0
+    "CodeRapportagestructuurgroep1",  # This becomes Code1
+]
 
-# Expected schema for fct_TrialBalances table
+
+# Expected schema for fct_TrialBalances table (DuckDB types)
 TRIAL_BALANCES_SCHEMA = {
-    "CodeGrootboekrekening": "str",
-    "NaamAdministratie": "str",
-    "CodeRelatiekostenplaats": "Int64",  # Nullable integer for codes
-    "NaamRelatiekostenplaats": "str",  # Force string even if all NULL
-    "Value": "float64",
-    "JaarPeriode": "str",
-    "LastDate": "datetime64[ns]",
-    "DisplayValue": "float64",
+    "CodeGrootboekrekening": "VARCHAR",
+    "NaamAdministratie": "VARCHAR",
+    "CodeRelatiekostenplaats": "BIGINT",  # Nullable integer for codes
+    "NaamRelatiekostenplaats": "VARCHAR",  # Force string even if all NULL
+    "Value": "DOUBLE",
+    "JaarPeriode": "VARCHAR",
+    "LastDate": "TIMESTAMP",
+    "DisplayValue": "DOUBLE",
 }
 
 
+@cache
 def parse_period_column(col_name: str) -> tuple[str, date] | None:
     """
     Parse period column name to extract year-month and last date.
@@ -46,6 +70,8 @@ def parse_period_column(col_name: str) -> tuple[str, date] | None:
         Tuple of (JaarPeriode, LastDate) or None if not a period column.
         - JaarPeriode: String in format 'YYYY-MM' (or 'YYYY-00' for opening)
         - LastDate: Last day of the period as a date object
+        Results are cached, as each header is parsed for column selection
+        and again when collecting the period columns.
 
     Example:
         >>> parse_period_column('januari2025')
@@ -55,211 +81,269 @@ def parse_period_column(col_name: str) -> tuple[str, date] | None:
         >>> parse_period_column('SomeOtherColumn')
         None
     """
-    col_lower = col_name.lower()
+    match = PERIOD_PATTERN.match(col_name)
+    if not match:
+        return None
+
+    period_name = match.group(1).lower()
+    year = int(match.group(2))
 
     # Handle opening balance
-    if col_lower.startswith("openingsbalans"):
-        year = int(col_name[-4:])
+    if period_name == "openingsbalans":
         return (f"{year}-00", date(year, 1, 1))
 
     # Handle regular months
-    for month_name, month_num in MONTH_MAP.items():
-        if col_lower.startswith(month_name):
-            year = int(col_name[-4:])
-            last_day = calendar.monthrange(year, month_num)[1]
-            return (f"{year}-{month_num:02d}", date(year, month_num, last_day))
-
-    return None
-
-
-def get_category(code1: str) -> str | None:
-    """Determine category based on Code1 value."""
-    if code1 in {"000", "010", "020", "030", "040", "050"}:
-        return "Activa"
-    elif code1 in {"060", "065", "070", "080"}:
-        return "Passiva"
-    elif code1 in {"500", "510"}:
-        return "Gross Margin"
-    elif code1 in {"520", "530", "540", "550"}:
-        return "Expenses"
-    return None
-
-
-def calculate_display_value(row: pd.Series) -> float | None:
-    """Calculate DisplayValue with sign correction based on category."""
-    category = get_category(str(row["Code1"]))
-    if category == "Activa":
-        return row["Value"]
-    elif category in {"Passiva", "Expenses", "Gross Margin"}:
-        return row["Value"] * -1
-    return None
+    month_num = MONTH_MAP[period_name]
+    last_day = calendar.monthrange(year, month_num)[1]
+    return (f"{year}-{month_num:02d}", date(year, month_num, last_day))
 
 
-def transform_trial_balances(input_path: Path, output_path: Path) -> None:
+# Code1 values per reporting category
+ACTIVA_CODES = frozenset({"000", "010", "020", "030", "040", "050"})
+PASSIVA_CODES = frozenset({"060", "065", "070", "080"})
+GROSS_MARGIN_CODES = frozenset({"500", "510"})
+EXPENSES_CODES = frozenset({"520", "530", "540", "550"})
+
+# Categories whose values are sign-flipped for reporting
+NEGATED_CODES = PASSIVA_CODES | GROSS_MARGIN_CODES | EXPENSES_CODES
+
+
+def _sql_list(values: frozenset[str]) -> str:
+    """Format string values as a sorted SQL IN-list."""
+    return ", ".join(f"'{value}'" for value in sorted(values))
+
+
+def display_value_sql(code1: str = "Code1", value: str = "Value") -> str:
     """
-    Transform Excel trial balance data to DuckDB database.
+    Build the SQL expression for DisplayValue (sign-corrected for reporting).
 
-    Replicates Power Query logic from fac_TrialBalances.m with the following steps:
-    1. Load Excel with monthly period columns
-    2. Unpivot period columns (Openingsbalans, januari-december) to rows
-    3. Calculate JaarPeriode (YYYY-MM format) and LastDate (last day of month)
-    4. Calculate DisplayValue with sign corrections per category (Activa/Passiva)
-    5. Generate synthetic profit rows by aggregating Gross Margin and Expenses
-    6. Pad account codes to 4 digits
-    7. Apply explicit schema for type safety
-    8. Write to DuckDB with validation
+    Activa keep their Value, Passiva/Expenses/Gross Margin are negated and
+    rows without a known category get NULL.
+    """
+    return (
+        f"CASE WHEN {code1} IN ({_sql_list(ACTIVA_CODES)}) THEN {value} "
+        f"WHEN {code1} IN ({_sql_list(NEGATED_CODES)}) THEN -{value} END"
+    )
+
+
+def build_trial_balances_query(
+    source: str,
+    period_columns: list[tuple[str, str, date]],
+) -> str:
+    """
+    Build the single SELECT producing all fct_TrialBalances rows.
+
+    One DuckDB query covers the whole Power Query logic:
+    1. Rename CodeDimensietype/CodeRapportagestructuurgroep1 to Code0/Code1,
+       zero-pad Code1 to 3 digits and account codes to 4 digits
+    2. UNPIVOT the period columns to rows (NULL cells are skipped)
+    3. Join a VALUES table mapping Period → (JaarPeriode, LastDate)
+    4. Calculate DisplayValue with sign corrections per category
+    5. UNION ALL synthetic profit rows (account 9999) per period
+    6. Cast every column to TRIAL_BALANCES_SCHEMA
 
     Args:
-        input_path: Path to Excel file containing trial balance data.
-            Expected columns: account codes, names, monthly periods.
-        output_path: Path to output DuckDB database file.
-            Table 'fct_TrialBalances' will be created/replaced.
+        source: Name of the table or registered view with the Excel rows.
+        period_columns: (column name, JaarPeriode, LastDate) per period column.
 
-    Raises:
-        FileNotFoundError: If input Excel file doesn't exist.
-        KeyError: If required columns are missing from Excel.
-        Exception: If database write fails.
+    Returns:
+        SQL SELECT statement producing columns in TRIAL_BALANCES_SCHEMA order.
+    """
+    periods = ", ".join(
+        f"('{col}', '{jaar_periode}', DATE '{last_date.isoformat()}')"
+        for col, jaar_periode, last_date in period_columns
+    )
+    unpivot_cols = ", ".join(f'"{col}"' for col, _, _ in period_columns)
+    # Cast each period column so UNPIVOT sees one numeric type
+    period_values = ", ".join(
+        f'TRY_CAST("{col}" AS DOUBLE) AS "{col}"' for col, _, _ in period_columns
+    )
+    code1 = pad_account_code_sql("TRY_CAST(CodeRapportagestructuurgroep1 AS BIGINT)", width=3)
+    output_cols = ", ".join(
+        f'TRY_CAST("{col}" AS {sql_type}) AS "{col}"'
+        for col, sql_type in TRIAL_BALANCES_SCHEMA.items()
+    )
 
-    Example:
-        >>> from pathlib import Path
-        >>> input_file = Path("import/2025_BalansenWinstverliesperperiode.xlsx")
-        >>> output_file = Path("export/trial_balances.duckdb")
-        >>> transform_trial_balances(input_file, output_file)
-        Loading Excel file: import/2025_BalansenWinstverliesperperiode.xlsx
-        Loaded 427 rows with 33 columns
-        ...
-        ✓ Verified: 1,775 rows written to fct_TrialBalances table
+    return f"""
+        WITH periods (Period, JaarPeriode, LastDate) AS (
+            VALUES {periods}
+        ),
+        -- Codes are padded once per account, before unpivot multiplies the rows
+        accounts AS (
+            SELECT
+                {pad_account_code_sql("CodeGrootboekrekening")} AS CodeGrootboekrekening,
+                NaamAdministratie,
+                CodeRelatiekostenplaats,
+                NaamRelatiekostenplaats,
+                CodeDimensietype AS Code0,
+                {code1} AS Code1,
+                {period_values}
+            FROM {source}
+        ),
+        facts AS (
+            SELECT
+                u.CodeGrootboekrekening,
+                u.NaamAdministratie,
+                u.CodeRelatiekostenplaats,
+                u.NaamRelatiekostenplaats,
+                u.Code0,
+                u.Code1,
+                u.Value,
+                p.JaarPeriode,
+                p.LastDate
+            FROM (
+                UNPIVOT accounts ON {unpivot_cols} INTO NAME Period VALUE Value
+            ) u
+            JOIN periods p USING (Period)
+        ),
+        all_rows AS (
+            SELECT
+                CodeGrootboekrekening,
+                NaamAdministratie,
+                CodeRelatiekostenplaats,
+                NaamRelatiekostenplaats,
+                Value,
+                JaarPeriode,
+                LastDate,
+                {display_value_sql()} AS DisplayValue
+            FROM facts
+            UNION ALL
+            -- Profit rows for "Winst lopend boekjaar"
+            SELECT
+                '9999',
+                NaamAdministratie,
+                NULL,
+                NULL,
+                -SUM(Value),
+                JaarPeriode,
+                LastDate,
+                SUM(Value)
+            FROM facts
+            WHERE Code0 = 'BAS'
+            GROUP BY JaarPeriode, LastDate, NaamAdministratie
+        )
+        SELECT {output_cols} FROM all_rows
     """
 
+
+def load_trial_balances(
+    con: duckdb.DuckDBPyConnection,
+    input_path: Path,
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Load the trial balance Excel file into fct_TrialBalances on an open connection.
+
+    Runs steps 1-8 of transform_trial_balances() without opening a
+    transaction, so callers can combine this load with other writes.
+
+    Args:
+        con: Open DuckDB connection to write to.
+        input_path: Path to Excel file containing trial balance data.
+        chunk_size: Rows read from the sheet per chunk. Default: CHUNK_SIZE.
+
+    Returns:
+        Number of rows written to fct_TrialBalances.
+
+    Raises:
+        ValueError: If required columns are missing or the sheet has no rows.
+    """
     # Step 1: Load Excel
     print(f"Loading Excel file: {input_path}")
-    df = pd.read_excel(input_path)
-    print(f"Loaded {len(df)} rows with {len(df.columns)} columns")
+    # Read straight into Arrow; only ID and period columns are converted.
+    # Every chunk infers its own Arrow types (a sparse column can be null in
+    # one chunk and double in the next), so chunks are inserted into a
+    # staging table with fixed types instead of being concatenated.
+    chunks = iter_excel_chunks(
+        input_path,
+        lambda col: col in ID_COLUMNS or parse_period_column(col) is not None,
+        chunk_size,
+    )
+    period_columns = None
+    loaded = 0
+    for chunk in chunks:
+        if period_columns is None:
+            period_columns = _create_staging_table(con, chunk.column_names)
+        con.register("trial_balance_chunk", chunk)
+        con.execute(
+            "INSERT INTO trial_balances " + _staging_select("trial_balance_chunk", period_columns)
+        )
+        con.unregister("trial_balance_chunk")
+        loaded += chunk.num_rows
+
+    if period_columns is None:
+        raise ValueError(f"No rows found in {input_path}")
+    print(f"Loaded {loaded} rows with {len(ID_COLUMNS) + len(period_columns)} columns")
+
+    # Steps 2-8: Transform and write in a single DuckDB query
+    print("Transforming in DuckDB...")
+
+    columns = ", ".join(f'"{col}" {sql_type}' for col, sql_type in TRIAL_BALANCES_SCHEMA.items())
+    con.execute(f"CREATE OR REPLACE TABLE fct_TrialBalances ({columns})")
+    # INSERT returns the number of rows written
+    row_count = con.execute(
+        "INSERT INTO fct_TrialBalances "
+        + build_trial_balances_query("trial_balances", period_columns)
+    ).fetchone()[0]
+    con.execute("DROP TABLE trial_balances")
+
+    return row_count
+
+
+def _create_staging_table(
+    con: duckdb.DuckDBPyConnection,
+    column_names: list[str],
+) -> list[tuple[str, str, date]]:
+    """
+    Create the temporary trial_balances staging table for the given sheet columns.
+
+    ID columns are staged as VARCHAR and period columns as DOUBLE, whatever
+    types the first chunk happened to infer.
+
+    Returns:
+        (column name, JaarPeriode, LastDate) per period column.
 
+    Raises:
+        ValueError: If any of ID_COLUMNS is missing.
+    """
     # Identify period columns (months + opening balance)
     period_columns = []
-    for col in df.columns:
+    for col in column_names:
         parsed = parse_period_column(col)
         if parsed:
             period_columns.append((col, parsed[0], parsed[1]))
 
     print(f"Found {len(period_columns)} period columns")
 
-    # ID columns to keep
-    id_columns = [
-        "CodeGrootboekrekening",
-        "NaamAdministratie",
-        "CodeRelatiekostenplaats",
-        "NaamRelatiekostenplaats",
-        "CodeDimensietype",  # This becomes Code0
-        "CodeRapportagestructuurgroep1",  # This becomes Code1
-    ]
-
     # Verify ID columns exist
-    missing_cols = [col for col in id_columns if col not in df.columns]
+    missing_cols = [col for col in ID_COLUMNS if col not in column_names]
     if missing_cols:
         raise ValueError(f"Missing required columns: {missing_cols}")
 
-    # Step 2: Unpivot (melt) period columns to long format
-    print("Unpivoting period columns...")
-    value_cols = [pc[0] for pc in period_columns]
-
-    melted = df.melt(
-        id_vars=id_columns,
-        value_vars=value_cols,
-        var_name="Period",
-        value_name="Value",
-    )
-
-    # Add JaarPeriode and LastDate based on Period column
-    period_info = {pc[0]: (pc[1], pc[2]) for pc in period_columns}
-    melted["JaarPeriode"] = melted["Period"].map(lambda x: period_info[x][0])
-    melted["LastDate"] = melted["Period"].map(lambda x: period_info[x][1])
-
-    # Rename columns to match M code expectations
-    melted = melted.rename(columns={
-        "CodeDimensietype": "Code0",
-        "CodeRapportagestructuurgroep1": "Code1",
-    })
+    columns = [f'"{col}" VARCHAR' for col in ID_COLUMNS]
+    columns += [f'"{col}" DOUBLE' for col, _, _ in period_columns]
+    con.execute(f"CREATE OR REPLACE TEMP TABLE trial_balances ({', '.join(columns)})")
 
-    # Convert Code1 to 3-digit zero-padded string
-    melted["Code1"] = melted["Code1"].apply(lambda x: f"{int(x):03d}" if pd.notna(x) else None)
+    return period_columns
 
-    # Drop the Period helper column
-    melted = melted.drop(columns=["Period"])
 
-    # Drop rows with null values
-    fact_df = melted.dropna(subset=["Value"]).copy()
-    print(f"After unpivot: {len(fact_df)} rows")
+def _staging_select(source: str, period_columns: list[tuple[str, str, date]]) -> str:
+    """Build the SELECT casting one chunk to the staging table's column types."""
+    columns = [f'CAST("{col}" AS VARCHAR)' for col in ID_COLUMNS]
+    columns += [f'TRY_CAST("{col}" AS DOUBLE)' for col, _, _ in period_columns]
+    return f"SELECT {', '.join(columns)} FROM {source}"
 
-    # Step 3: Add DisplayValue (sign-corrected for reporting)
-    print("Calculating DisplayValue...")
-    fact_df["DisplayValue"] = fact_df.apply(calculate_display_value, axis=1)
 
-    # Step 4: Calculate Profit rows for "Winst lopend boekjaar"
-    print("Calculating profit rows...")
-    balance_df = fact_df[fact_df["Code0"] == "BAS"].copy()
-
-    profit_per_period = (
-        balance_df.groupby(["JaarPeriode", "LastDate", "NaamAdministratie"])["Value"]
-        .sum()
-        .reset_index()
-        .rename(columns={"Value": "Profit"})
-    )
-
-    # Create synthetic profit rows
-    profit_rows = pd.DataFrame({
-        "CodeGrootboekrekening": "9999",
-        "LastDate": profit_per_period["LastDate"],
-        "JaarPeriode": profit_per_period["JaarPeriode"],
-        "NaamAdministratie": profit_per_period["NaamAdministratie"],
-        "CodeRelatiekostenplaats": None,
-        "NaamRelatiekostenplaats": None,
-        "Code0": "BAS",
-        "Code1": "060",
-        "Value": profit_per_period["Profit"] * -1,
-        "DisplayValue": profit_per_period["Profit"],
-    })
-
-    print(f"Created {len(profit_rows)} profit rows")
-
-    # Step 5: Combine base rows + profit rows
-    combined_df = pd.concat([fact_df, profit_rows], ignore_index=True)
-
-    # Step 6: Remove helper columns not needed downstream
-    final_df = combined_df.drop(columns=["Code0", "Code1"])
-
-    # Step 7: Pad CodeGrootboekrekening to 4 digits with leading zeros
-    final_df["CodeGrootboekrekening"] = pad_account_code(final_df["CodeGrootboekrekening"])
-
-    # Step 8: Apply explicit schema to ensure correct types
-    print("Applying schema...")
-    final_df = apply_schema(final_df, TRIAL_BALANCES_SCHEMA)
-
-    print(f"Final dataset: {len(final_df)} rows")
-    print("\nFinal schema:")
-    print(final_df.dtypes)
-
-    # Validate schema before writing
-    if not validate_schema(final_df, TRIAL_BALANCES_SCHEMA):
-        print("Warning: Schema validation found issues, but continuing...")
-
-    # Write to DuckDB using shared utility
-    print(f"\nWriting to DuckDB: {output_path}")
-    row_count = write_to_duckdb(
-        final_df,
-        str(output_path),
-        "fct_TrialBalances",
-        if_exists="replace"
-    )
-    print(f"✓ Verified: {row_count:,} rows written to fct_TrialBalances table")
-
-    # Create views for common queries
-    import duckdb
-    con = duckdb.connect(str(output_path))
+def create_views(con: duckdb.DuckDBPyConnection) -> int:
+    """
+    Create views for common queries on fct_TrialBalances.
 
-    print("\nCreating views...")
+    Args:
+        con: Open DuckDB connection holding fct_TrialBalances.
 
+    Returns:
+        Number of unique account codes in vw_UniqueAccountCodes.
+    """
     # View 1: Unique account codes
     con.execute("""
         CREATE OR REPLACE VIEW vw_UniqueAccountCodes AS
@@ -270,17 +354,76 @@ def transform_trial_balances(input_path: Path, output_path: Path) -> None:
     unique_count = con.execute("SELECT COUNT(*) FROM vw_UniqueAccountCodes").fetchone()[0]
     print(f"  ✓ Created vw_UniqueAccountCodes ({unique_count} unique codes)")
 
-    # Show sample
-    print("\nSample rows from fct_TrialBalances:")
-    sample = con.execute("SELECT * FROM fct_TrialBalances LIMIT 5").fetchdf()
-    print(sample)
+    return unique_count
+
 
-    # Show sample of unique codes
-    print("\nSample from vw_UniqueAccountCodes (first 10):")
-    codes = con.execute("SELECT * FROM vw_UniqueAccountCodes LIMIT 10").fetchdf()
-    print(codes)
+def transform_trial_balances(input_path: Path, output_path: Path) -> None:
+    """
+    Transform Excel trial balance data to DuckDB database.
+
+    Replicates Power Query logic from fac_TrialBalances.m with the following steps:
+    1. Load Excel with monthly period columns
+    2. Unpivot period columns (Openingsbalans, januari-december) to rows
+    3. Calculate JaarPeriode (YYYY-MM format) and LastDate (last day of month)
+    4. Calculate DisplayValue with sign corrections per category (Activa/Passiva)
+    5. Generate synthetic profit rows by aggregating Gross Margin and Expenses
+    6. Pad account codes to 4 digits
+    7. Apply explicit schema for type safety
+    8. Write to DuckDB
+
+    Steps 2-8 run as one DuckDB query (see build_trial_balances_query).
+
+    Args:
+        input_path: Path to Excel file containing trial balance data.
+            Expected columns: account codes, names, monthly periods.
+        output_path: Path to output DuckDB database file.
+            Table 'fct_TrialBalances' will be created/replaced.
+
+    Raises:
+        FileNotFoundError: If input Excel file doesn't exist.
+        KeyError: If required columns are missing from Excel.
+        Exception: If database write fails.
+
+    Example:
+        >>> from pathlib import Path
+        >>> input_file = Path("import/2025_BalansenWinstverliesperperiode.xlsx")
+        >>> output_file = Path("export/trial_balances.duckdb")
+        >>> transform_trial_balances(input_file, output_file)
+        Loading Excel file: import/2025_BalansenWinstverliesperperiode.xlsx
+        Loaded 427 rows with 19 columns
+        ...
+        ✓ Verified: 1,775 rows written to fct_TrialBalances table
+    """
 
-    con.close()
+    with open_duckdb(output_path) as con:
+        con.begin()
+        row_count = load_trial_balances(con, input_path)
+        con.commit()
+
+        print("\nFinal schema:")
+        print(con.sql("DESCRIBE fct_TrialBalances").project("column_name, column_type"))
+
+        print(f"✓ Verified: {row_count:,} rows written to fct_TrialBalances table")
+
+        # Create views for common queries
+        print("\nCreating views...")
+        create_views(con)
+
+        # Show sample
+        print("\nSample rows from fct_TrialBalances:")
+        sample = con.execute("""
+            SELECT * FROM fct_TrialBalances
+            ORDER BY JaarPeriode, CodeGrootboekrekening
+            LIMIT 5
+        """).fetchdf()
+        print(sample)
+
+        # Show sample of unique codes
+        print("\nSample from vw_UniqueAccountCodes (first 10):")
+        codes = con.execute(
+            "SELECT * FROM vw_UniqueAccountCodes ORDER BY CodeGrootboekrekening LIMIT 10"
+        ).fetchdf()
+        print(codes)
 
     print("\nDone!")
 
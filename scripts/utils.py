@@ -2,10 +2,11 @@
 Shared utility functions for data transformation scripts.
 
 This module provides common utilities used across the ETL pipeline:
-- Account code padding (standardization)
+- Chunked Excel reading (bounded memory)
+- Account code padding (standardization, in pandas or DuckDB SQL)
 - Data type schema application (type safety)
 - Schema validation (data quality)
-- DuckDB write operations (consistency)
+- DuckDB connections, registration via Arrow and write operations (consistency)
 
 Example:
     >>> import pandas as pd
@@ -22,9 +23,96 @@ Example:
     >>> typed_df = apply_schema(df, schema)
 """
 
-from typing import Optional
+import os
+from collections.abc import Callable, Hashable, Iterator
+from contextlib import contextmanager
+from itertools import batched
+from pathlib import Path
+from typing import Any
+
 import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from python_calamine import CalamineWorkbook
+
+# Schema types converted with coercion (invalid values become NaN/NaT/<NA>)
+_COERCED_TYPES = frozenset({"datetime64[ns]", "float64", "Float64", "Int64", "int64"})
+
+
+def iter_excel_chunks(
+    input_path: str | Path,
+    columns: list[str] | Callable[[str], bool],
+    chunk_size: int = 50_000,
+) -> Iterator[pa.Table]:
+    """
+    Stream the first sheet of an Excel file as Arrow tables.
+
+    Rows are pulled from calamine's row iterator and converted chunk by chunk,
+    so only one chunk of Python values is alive at a time instead of the whole
+    sheet as a DataFrame.
+
+    Cells are normalised the same way pandas' calamine reader does:
+    empty cells become NULL and integral floats become ints (so an account
+    code 45 stays "45", not "45.0"). Columns mixing strings and numbers are
+    returned as strings, as with dtype_backend="pyarrow".
+
+    Args:
+        input_path: Path to .xls or .xlsx file. The first row is the header.
+        columns: Columns to return, in output order. Others are skipped.
+            A callable is evaluated against each header name instead (like
+            pandas' usecols) and matching columns are returned in sheet order.
+        chunk_size: Maximum number of rows per yielded table.
+
+    Yields:
+        pyarrow Table with the requested columns for each chunk of rows.
+
+    Raises:
+        FileNotFoundError: If the Excel file doesn't exist.
+        ValueError: If any of the requested columns is missing.
+
+    Example:
+        >>> for chunk in iter_excel_chunks("import/DUMP_13jun25.xls", ["Saldo"]):
+        ...     print(chunk.num_rows)
+        7388
+    """
+    workbook = CalamineWorkbook.from_path(str(input_path))
+    rows = workbook.get_sheet_by_index(0).iter_rows()
+    header = [str(col) for col in next(rows, [])]
+    if callable(columns):
+        columns = [col for col in header if columns(col)]
+
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    positions = [header.index(col) for col in columns]
+
+    for batch in batched(rows, chunk_size):
+        yield pa.table(
+            {
+                col: _excel_column_to_arrow([row[pos] for row in batch])
+                for col, pos in zip(columns, positions, strict=True)
+            }
+        )
+
+
+def _excel_cell(value: Any) -> Any:
+    """Normalise a calamine cell value like pandas' calamine reader."""
+    if isinstance(value, str) and value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _excel_column_to_arrow(values: list[Any]) -> pa.Array:
+    """Convert one column of calamine cells to an Arrow array."""
+    cells = [_excel_cell(value) for value in values]
+    try:
+        return pa.array(cells)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type column: keep as strings
+        return pa.array([None if cell is None else str(cell) for cell in cells], pa.string())
 
 
 def pad_account_code(code_series: pd.Series) -> pd.Series:
@@ -59,11 +147,51 @@ def pad_account_code(code_series: pd.Series) -> pd.Series:
 
     Note:
         Always converts to string type, even if input is numeric.
+        Integer and string Series are padded with PyArrow's utf8_lpad
+        kernel; other dtypes (floats, mixed objects) use pandas' str.zfill.
     """
+    if pd.api.types.is_integer_dtype(code_series) or isinstance(code_series.dtype, pd.StringDtype):
+        codes = pc.cast(pa.array(code_series, from_pandas=True), pa.string())
+        padded = pc.utf8_lpad(codes, width=4, padding="0").to_pandas()
+        padded.index = code_series.index
+        padded.name = code_series.name
+        return padded
+
     return code_series.astype(str).str.zfill(4)
 
 
-def apply_schema(df: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
+def pad_account_code_sql(column: str, width: int = 4) -> str:
+    """
+    Build the DuckDB SQL equivalent of pad_account_code().
+
+    Use this when account codes are padded inside a DuckDB query instead of
+    in pandas. DuckDB's lpad() truncates strings longer than the target width,
+    so longer codes are passed through unchanged to keep the same rules as
+    pad_account_code().
+
+    Args:
+        column: Column name (or SQL expression) holding the account code.
+        width: Number of digits to pad to. Default: 4 (account codes).
+
+    Returns:
+        SQL expression producing the padded account code as VARCHAR.
+
+    Example:
+        >>> import duckdb
+        >>> expr = pad_account_code_sql("code")
+        >>> duckdb.sql(f"SELECT {expr} FROM (VALUES (10), (12345)) t(code)").fetchall()
+        [('0010',), ('12345',)]
+    """
+    code = f"CAST({column} AS VARCHAR)"
+    return f"CASE WHEN length({code}) >= {width} THEN {code} ELSE lpad({code}, {width}, '0') END"
+
+
+def apply_schema(
+    df: pd.DataFrame,
+    schema: dict[str, str],
+    *,
+    copy: bool = True,
+) -> pd.DataFrame:
     """
     Apply explicit data types to DataFrame columns.
 
@@ -73,7 +201,7 @@ def apply_schema(df: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
     - Nullable numeric codes (need Int64, not int64)
 
     Supported type strings:
-        - 'str': String/VARCHAR type
+        - 'str': String/VARCHAR type (pandas' pyarrow-backed string dtype)
         - 'datetime64[ns]': Datetime/timestamp type
         - 'float64', 'Float64': Floating point numbers
         - 'int64': Integer (no NULLs allowed)
@@ -83,9 +211,13 @@ def apply_schema(df: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
     Args:
         df: DataFrame to apply types to.
         schema: Dictionary mapping column names to pandas dtype strings.
+        copy: If True (default), return a new DataFrame and leave the input
+            unchanged. If False, assign the converted columns into df itself
+            and return it, for callers that no longer need the original.
 
     Returns:
-        DataFrame with corrected types. Returns a copy, doesn't modify in place.
+        DataFrame with corrected types. With copy=True, columns that need no
+        conversion are shared with the input rather than copied.
 
     Raises:
         None: All type conversions use error handling. Warnings are printed
@@ -107,48 +239,72 @@ def apply_schema(df: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
         ... }
         >>> typed_df = apply_schema(df, schema)
         >>> typed_df.dtypes
-        code                       object
-        value                     float64
-        date              datetime64[ns]
-        nullable_int               Int64
+        code                       str
+        value                  float64
+        date            datetime64[us]
+        nullable_int             Int64
         dtype: object
 
     See Also:
         - docs/DATA_TYPE_STRATEGY.md for comprehensive type handling guide
         - validate_schema() for schema validation before writing to database
     """
-    df_typed = df.copy()
+    converted: dict[Hashable, pd.Series] = {}
+    plain_types: dict[str, str] = {}
 
     for col, dtype in schema.items():
-        if col not in df_typed.columns:
+        if col not in df.columns:
             print(f"Warning: Column '{col}' in schema but not found in DataFrame")
             continue
 
-        try:
-            if dtype == "datetime64[ns]":
-                # Handle dates with explicit conversion
-                df_typed[col] = pd.to_datetime(df_typed[col], errors="coerce")
+        if dtype in _COERCED_TYPES:
+            # Types needing coercion are converted column by column
+            try:
+                converted[col] = _coerce_column(df[col], dtype)
+            except Exception as e:
+                print(f"Warning: Could not convert column '{col}' to {dtype}: {e}")
+        else:
+            # Plain casts (str, bool, category, ...) are applied in one astype call
+            plain_types[col] = dtype
+
+    # With copy-on-write, a shallow copy shares all column data and only the
+    # converted columns are allocated; copy=False assigns into df itself.
+    df_typed = df.copy(deep=False) if copy else df
+
+    try:
+        converted.update(df[list(plain_types)].astype(plain_types).items())
+    except Exception:
+        for col, dtype in plain_types.items():
+            try:
+                converted[col] = df[col].astype(dtype)
+            except Exception as e:
+                print(f"Warning: Could not convert column '{col}' to {dtype}: {e}")
 
-            elif dtype in ["float64", "Float64"]:
-                # Handle numeric with coercion (invalid values → NaN)
-                df_typed[col] = pd.to_numeric(df_typed[col], errors="coerce")
+    for label, series in converted.items():
+        df_typed[label] = series
 
-            elif dtype in ["Int64", "int64"]:
-                # Nullable integer for codes (Int64 allows NaN)
-                df_typed[col] = pd.to_numeric(df_typed[col], errors="coerce").astype("Int64")
+    return df_typed
 
-            elif dtype == "str":
-                # Force string type (important for all-NULL columns)
-                df_typed[col] = df_typed[col].astype("str")
 
-            else:
-                # Other types (bool, category, etc.)
-                df_typed[col] = df_typed[col].astype(dtype)
+def _coerce_column(series: pd.Series, dtype: str) -> pd.Series:
+    """Convert a single column to one of the _COERCED_TYPES."""
+    if dtype == "datetime64[ns]":
+        # Handle dates with explicit conversion
+        return pd.to_datetime(series, errors="coerce")
 
-        except Exception as e:
-            print(f"Warning: Could not convert column '{col}' to {dtype}: {e}")
+    if dtype in ["float64", "Float64"]:
+        # Handle numeric with coercion (invalid values → NaN)
+        return pd.to_numeric(series, errors="coerce")
 
-    return df_typed
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Already numeric: one Arrow cast to int64 keeps NULLs as <NA>
+        # without parsing the values again
+        ints = pc.cast(pa.array(series, from_pandas=True), pa.int64())
+        typed = ints.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+        return typed.set_axis(series.index).rename(series.name)
+
+    # Nullable integer for codes (Int64 allows NaN)
+    return pd.to_numeric(series, errors="coerce").astype("Int64")
 
 
 def validate_schema(
@@ -179,17 +335,21 @@ def validate_schema(
     Example:
         >>> import pandas as pd
         >>> df = pd.DataFrame({'code': ['10', '20'], 'value': [1.5, 2.5]})
-        >>> schema = {'code': 'object', 'value': 'float64'}
+        >>> schema = {'code': 'str', 'value': 'float64'}
         >>> validate_schema(df, schema)
         True
         >>> validate_schema(df, {'code': 'int64', 'value': 'float64'})
-        Warning: Type mismatch for 'code': expected int64, got object
+        Warning: Type mismatch for 'code': expected int64, got str
         False
     """
     is_valid = True
 
+    # Read all dtypes at once instead of building a Series per column
+    actual_types = df.dtypes.astype(str).to_dict()
+    expected_cols = expected_schema.keys()
+
     # Check for missing columns
-    missing = set(expected_schema.keys()) - set(df.columns)
+    missing = expected_cols - actual_types.keys()
     if missing:
         msg = f"Missing required columns: {sorted(missing)}"
         if strict:
@@ -198,7 +358,7 @@ def validate_schema(
         is_valid = False
 
     # Check for unexpected columns
-    extra = set(df.columns) - set(expected_schema.keys())
+    extra = actual_types.keys() - expected_cols
     if extra:
         msg = f"Unexpected columns found: {sorted(extra)}"
         print(f"Info: {msg}")
@@ -206,26 +366,175 @@ def validate_schema(
 
     # Check types match
     for col, expected_type in expected_schema.items():
-        if col in df.columns:
-            actual_type = str(df[col].dtype)
-            # Normalize type comparison (e.g., 'object' == 'str')
-            if actual_type != expected_type and not (
-                actual_type == "object" and expected_type == "str"
-            ):
-                msg = f"Type mismatch for '{col}': expected {expected_type}, got {actual_type}"
-                if strict:
-                    raise ValueError(msg)
-                print(f"Warning: {msg}")
-                is_valid = False
+        actual_type = actual_types.get(col)
+        # Normalize type comparison (e.g., 'object' == 'str')
+        if (
+            actual_type is not None
+            and actual_type != expected_type
+            and not (actual_type == "object" and expected_type == "str")
+        ):
+            msg = f"Type mismatch for '{col}': expected {expected_type}, got {actual_type}"
+            if strict:
+                raise ValueError(msg)
+            print(f"Warning: {msg}")
+            is_valid = False
 
     return is_valid
 
 
+def connect_duckdb(
+    path: str = ":memory:",
+    memory_limit: str | None = None,
+) -> duckdb.DuckDBPyConnection:
+    """
+    Open a DuckDB connection configured for bulk ETL writes.
+
+    All scripts connect through this helper so they share the same settings:
+    - threads: use every available core
+    - preserve_insertion_order: disabled, so CREATE TABLE AS / INSERT can
+      write in parallel instead of serializing to keep row order
+
+    Args:
+        path: Path to DuckDB database file. Default: in-memory database.
+        memory_limit: Maximum memory DuckDB may use, e.g. "4GB"; beyond it,
+            large joins and sorts spill to disk. Default: DuckDB's own limit
+            (80% of system RAM).
+
+    Returns:
+        Open DuckDB connection. The caller is responsible for closing it.
+
+    Note:
+        Row order of written tables is not guaranteed. Use ORDER BY when
+        reading if order matters.
+
+    Example:
+        >>> con = connect_duckdb("export/combined.db")
+        >>> con.execute("SELECT COUNT(*) FROM transactions").fetchone()
+        (7388,)
+        >>> con.close()
+    """
+    config: dict[str, Any] = {
+        "threads": str(os.cpu_count() or 1),
+        "preserve_insertion_order": "false",
+    }
+    if memory_limit is not None:
+        config["memory_limit"] = memory_limit
+    return duckdb.connect(str(path), config=config)
+
+
+@contextmanager
+def open_duckdb(
+    path: str = ":memory:",
+    memory_limit: str | None = None,
+) -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Open a DuckDB connection for a block of writes and close it afterwards.
+
+    Creates the parent directory of a database file if needed, then yields a
+    connection from connect_duckdb(). Pass the connection to write_to_duckdb()
+    to reuse it across several writes instead of reopening the file each time.
+
+    Args:
+        path: Path to DuckDB database file. Default: in-memory database.
+        memory_limit: Passed to connect_duckdb(). Default: DuckDB's own limit.
+
+    Yields:
+        Open DuckDB connection, closed when the block exits.
+
+    Example:
+        >>> with open_duckdb("export/combined.db") as con:
+        ...     write_to_duckdb(df1, None, "table1", con=con)
+        ...     write_to_duckdb(df2, None, "table2", con=con)
+    """
+    if str(path) != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    con = connect_duckdb(path, memory_limit)
+    try:
+        yield con
+    finally:
+        con.close()
+
+
+def register_dataframe(
+    con: duckdb.DuckDBPyConnection,
+    view_name: str,
+    df: pd.DataFrame,
+) -> None:
+    """
+    Register a DataFrame with DuckDB as an Arrow table.
+
+    DuckDB scans Arrow buffers directly (zero-copy for numeric and timestamp
+    columns), which avoids the pandas replacement scan that converts columns
+    block by block on every query.
+
+    Args:
+        con: Open DuckDB connection.
+        view_name: Name under which the data can be queried.
+        df: DataFrame to register.
+
+    Note:
+        Object columns holding mixed Python types (e.g. strings and ints read
+        from the same Excel column) cannot be converted to Arrow. In that case
+        the DataFrame is registered as-is and DuckDB falls back to scanning
+        pandas.
+
+    Example:
+        >>> con = connect_duckdb()
+        >>> register_dataframe(con, "codes", pd.DataFrame({"code": ["10", "20"]}))
+        >>> con.execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+        2
+    """
+    try:
+        data = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        data = df
+
+    con.register(view_name, data)
+
+
+def estimated_row_count(
+    con: duckdb.DuckDBPyConnection,
+    table: str,
+    database: str | None = None,
+) -> int:
+    """
+    Read a table's estimated row count from the DuckDB catalog instead of scanning it.
+
+    Args:
+        con: Open DuckDB connection.
+        table: Table name.
+        database: Catalog (database or ATTACH alias) holding the table.
+            Default: the connection's current database.
+
+    Returns:
+        The catalog's estimated_size for the table. It equals the row count
+        of tables that were only ever written by CREATE TABLE AS / INSERT.
+
+    Note:
+        This is an estimate. Deleted rows are still counted until DuckDB
+        vacuums them, and rows written by a transaction that is still open
+        are not included. Use SELECT COUNT(*) where an exact count matters.
+    """
+    if database is None:
+        database = con.execute("SELECT current_database()").fetchone()[0]
+    return con.execute(
+        "SELECT estimated_size FROM duckdb_tables() WHERE database_name = ? AND table_name = ?",
+        [database, table],
+    ).fetchone()[0]
+
+
+def _quote_identifier(name: str) -> str:
+    """Quote a table or column name for use in DuckDB SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
 def write_to_duckdb(
     df: pd.DataFrame,
-    output_path: str,
+    output_path: str | None,
     table_name: str,
     if_exists: str = "replace",
+    con: duckdb.DuckDBPyConnection | None = None,
 ) -> int:
     """
     Write DataFrame to DuckDB database with consistent error handling.
@@ -235,18 +544,22 @@ def write_to_duckdb(
 
     Args:
         df: DataFrame to write.
-        output_path: Path to DuckDB database file.
+        output_path: Path to DuckDB database file. Ignored when con is given,
+            required otherwise.
         table_name: Name of table to create.
         if_exists: What to do if table exists:
             - 'replace': Drop and recreate table (default)
-            - 'append': Append rows to existing table
+            - 'append': Append rows to existing table (columns matched by name)
             - 'fail': Raise error if table exists
+        con: Open connection to write with (see open_duckdb()). It is left
+            open. Default: open output_path for this write only.
 
     Returns:
-        Number of rows written to database.
+        Number of rows in the table after the write.
 
     Raises:
-        ValueError: If if_exists is not valid.
+        ValueError: If if_exists is not valid, or neither output_path nor
+            con is given.
         Exception: If database write fails.
 
     Example:
@@ -256,35 +569,36 @@ def write_to_duckdb(
         >>> print(f"Wrote {rows} rows")
         Wrote 3 rows
     """
-    from pathlib import Path
-
     if if_exists not in ["replace", "append", "fail"]:
         raise ValueError(f"if_exists must be 'replace', 'append', or 'fail', got: {if_exists}")
 
-    # Ensure output directory exists
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    if con is None:
+        if output_path is None:
+            raise ValueError("output_path is required when no connection is given")
+        with open_duckdb(output_path) as own_con:
+            return write_to_duckdb(df, output_path, table_name, if_exists, con=own_con)
 
-    # Connect to database
-    con = duckdb.connect(str(output_path))
+    register_dataframe(con, "source_df", df)
 
     try:
+        # CREATE TABLE AS / INSERT return the number of rows they wrote,
+        # so the table does not need to be scanned again to verify it
+        table = _quote_identifier(table_name)
+        create_table = f"CREATE TABLE {table} AS SELECT * FROM source_df"
         if if_exists == "replace":
-            con.execute(f"DROP TABLE IF EXISTS {table_name}")
-            con.execute(f"CREATE TABLE {table_name} AS SELECT * FROM df")
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+            row_count = con.execute(create_table).fetchone()[0]
         elif if_exists == "append":
-            # Check if table exists
-            tables = con.execute("SHOW TABLES").fetchall()
-            table_exists = any(t[0] == table_name for t in tables)
-            if table_exists:
-                con.execute(f"INSERT INTO {table_name} SELECT * FROM df")
-            else:
-                con.execute(f"CREATE TABLE {table_name} AS SELECT * FROM df")
+            # Creates an empty table with the frame's columns only if missing,
+            # so appending needs no lookup of existing tables
+            con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM source_df LIMIT 0")
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM source_df")
+            # The catalog count misses rows of an open transaction on a
+            # shared connection, so the total is counted exactly here
+            row_count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         elif if_exists == "fail":
-            con.execute(f"CREATE TABLE {table_name} AS SELECT * FROM df")
-
-        # Verify row count
-        row_count = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-        return row_count
-
+            row_count = con.execute(create_table).fetchone()[0]
     finally:
-        con.close()
+        con.unregister("source_df")
+
+    return row_count
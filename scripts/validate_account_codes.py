@@ -11,18 +11,72 @@ entries in the trial balances, which is required for proper reporting.
 
 import sys
 from pathlib import Path
-from typing import Tuple
 
-import pandas as pd
+import duckdb
+import pyarrow as pa
 
-from utils import pad_account_code
+from utils import iter_excel_chunks, open_duckdb, pad_account_code_sql
 
 
-def read_transaction_codes(file_path: Path) -> set[str]:
+def read_account_codes(
+    con: duckdb.DuckDBPyConnection,
+    file_path: Path,
+    table: str,
+    chunk_size: int = 50_000,
+) -> int:
+    """
+    Load the distinct padded CodeGrootboekrekening values of an Excel file into DuckDB.
+
+    Only this column is converted from the sheet, one chunk at a time;
+    padding and de-duplication run in DuckDB, so no per-row Python objects
+    are built and the column is never held in memory as a whole.
+
+    Args:
+        con: Open DuckDB connection.
+        file_path: Path to .xls or .xlsx file.
+        table: Table to create with one 'code' column of unique padded
+            account codes (4 digits), excluding rows without a code.
+        chunk_size: Rows read from the sheet per chunk. Default: 50,000.
+
+    Returns:
+        Number of data rows in the sheet.
+
+    Raises:
+        FileNotFoundError: If the Excel file doesn't exist.
+        ValueError: If the file has no CodeGrootboekrekening column.
+    """
+    con.execute(f"CREATE OR REPLACE TABLE {table} (code VARCHAR)")
+
+    row_count = 0
+    for chunk in iter_excel_chunks(file_path, ["CodeGrootboekrekening"], chunk_size):
+        con.register("codes", chunk)
+        # Apply same padding logic as in transformation scripts; EXCEPT keeps
+        # only codes not seen in earlier chunks (and de-duplicates this one)
+        con.execute(f"""
+            INSERT INTO {table}
+            SELECT {pad_account_code_sql("CodeGrootboekrekening")}
+            FROM codes
+            WHERE CodeGrootboekrekening IS NOT NULL
+            EXCEPT
+            SELECT code FROM {table}
+        """)
+        con.unregister("codes")
+        row_count += chunk.num_rows
+
+    return row_count
+
+
+def _fetch_codes(con: duckdb.DuckDBPyConnection, query: str) -> set[str]:
+    """Run a query returning one column of codes and collect them as a set."""
+    return {code for (code,) in con.execute(query).fetchall()}
+
+
+def read_transaction_codes(con: duckdb.DuckDBPyConnection, file_path: Path) -> set[str]:
     """
     Read and extract unique account codes from transactions file.
 
     Args:
+        con: Open DuckDB connection; codes are kept in 'transaction_codes'.
         file_path: Path to DUMP_13jun25.xls file.
 
     Returns:
@@ -32,23 +86,21 @@ def read_transaction_codes(file_path: Path) -> set[str]:
         FileNotFoundError: If transactions file doesn't exist.
     """
     print(f"Reading transactions: {file_path}")
-    df = pd.read_excel(file_path)
+    row_count = read_account_codes(con, file_path, "transaction_codes")
+    unique_codes = _fetch_codes(con, "SELECT code FROM transaction_codes")
 
-    # Apply same padding logic as in transformation scripts
-    codes = pad_account_code(df["CodeGrootboekrekening"])
-    unique_codes = set(codes.unique())
-
-    print(f"  Found {len(df):,} transactions")
+    print(f"  Found {row_count:,} transactions")
     print(f"  Found {len(unique_codes)} unique account codes")
 
     return unique_codes
 
 
-def read_trial_balance_codes(file_path: Path) -> set[str]:
+def read_trial_balance_codes(con: duckdb.DuckDBPyConnection, file_path: Path) -> set[str]:
     """
     Read and extract unique account codes from trial balances file.
 
     Args:
+        con: Open DuckDB connection; codes are kept in 'trial_balance_codes'.
         file_path: Path to trial balances Excel file.
 
     Returns:
@@ -58,27 +110,25 @@ def read_trial_balance_codes(file_path: Path) -> set[str]:
         FileNotFoundError: If trial balances file doesn't exist.
     """
     print(f"\nReading trial balances: {file_path}")
-    df = pd.read_excel(file_path)
-
-    # Apply same padding logic as in transformation scripts
-    codes = pad_account_code(df["CodeGrootboekrekening"])
-    unique_codes = set(codes.unique())
+    row_count = read_account_codes(con, file_path, "trial_balance_codes")
+    unique_codes = _fetch_codes(con, "SELECT code FROM trial_balance_codes")
 
-    print(f"  Found {len(df):,} rows")
+    print(f"  Found {row_count:,} rows")
     print(f"  Found {len(unique_codes)} unique account codes")
 
     return unique_codes
 
 
-def validate_codes(
-    transaction_codes: set[str], trial_balance_codes: set[str]
-) -> Tuple[set[str], set[str], set[str]]:
+def validate_codes(con: duckdb.DuckDBPyConnection) -> tuple[set[str], set[str], set[str]]:
     """
     Validate account code consistency between transactions and trial balances.
 
+    Compares the 'transaction_codes' and 'trial_balance_codes' tables created
+    by read_transaction_codes() and read_trial_balance_codes() with SQL set
+    operations.
+
     Args:
-        transaction_codes: Set of account codes from transactions.
-        trial_balance_codes: Set of account codes from trial balances.
+        con: Open DuckDB connection holding both code tables.
 
     Returns:
         Tuple of (missing_codes, extra_codes, common_codes):
@@ -86,9 +136,15 @@ def validate_codes(
         - extra_codes: Codes in trial balances but NOT in transactions
         - common_codes: Codes present in both
     """
-    missing_codes = transaction_codes - trial_balance_codes
-    extra_codes = trial_balance_codes - transaction_codes
-    common_codes = transaction_codes & trial_balance_codes
+    missing_codes = _fetch_codes(
+        con, "SELECT code FROM transaction_codes EXCEPT SELECT code FROM trial_balance_codes"
+    )
+    extra_codes = _fetch_codes(
+        con, "SELECT code FROM trial_balance_codes EXCEPT SELECT code FROM transaction_codes"
+    )
+    common_codes = _fetch_codes(
+        con, "SELECT code FROM transaction_codes INTERSECT SELECT code FROM trial_balance_codes"
+    )
 
     return missing_codes, extra_codes, common_codes
 
@@ -190,14 +246,13 @@ def validate_account_codes(
         True
     """
     try:
-        # Read account codes from both files
-        transaction_codes = read_transaction_codes(Path(transactions_path))
-        trial_balance_codes = read_trial_balance_codes(Path(trial_balances_path))
+        with open_duckdb() as con:
+            # Read account codes from both files
+            transaction_codes = read_transaction_codes(con, Path(transactions_path))
+            trial_balance_codes = read_trial_balance_codes(con, Path(trial_balances_path))
 
-        # Validate consistency
-        missing_codes, extra_codes, common_codes = validate_codes(
-            transaction_codes, trial_balance_codes
-        )
+            # Validate consistency
+            missing_codes, extra_codes, common_codes = validate_codes(con)
 
         # Print report
         validation_passed = print_validation_report(
@@ -213,7 +268,11 @@ def validate_account_codes(
     except FileNotFoundError as e:
         print(f"\n❌ ERROR: File not found: {e}", file=sys.stderr)
         return False
-    except KeyError as e:
+    except pa.ArrowException as e:
+        # Checked first: ArrowInvalid is also a ValueError
+        print(f"\n❌ ERROR: Could not read account codes: {e}", file=sys.stderr)
+        return False
+    except (KeyError, ValueError) as e:
         print(
             f"\n❌ ERROR: Required column not found: {e}",
             file=sys.stderr,
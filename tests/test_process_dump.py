@@ -0,0 +1,49 @@
+"""Tests for the transaction dump processing."""
+
+from datetime import datetime
+
+import duckdb
+import pyarrow as pa
+
+from scripts.process_dump import TRANSACTIONS_SCHEMA, build_transactions_query
+
+
+class TestBuildTransactionsQuery:
+    """Tests for build_transactions_query function."""
+
+    def test_selects_and_casts_schema_columns(self):
+        """Test codes are padded, dates converted, bad values NULL and extra columns dropped."""
+        dates = [datetime(2025, 1, 1), datetime(2025, 2, 15, 12)]
+        source = pa.table(
+            {
+                "NaamAdministratie": ["Adm", "Adm"],
+                "CodeGrootboekrekening": [10, 1234],
+                "NaamGrootboekrekening": ["Kas", "Bank"],
+                "Code": ["M", "B"],
+                # Not a number: TRY_CAST falls back to NULL
+                "Boekingsnummer": ["12", "x"],
+                # The dates above as timestamp milliseconds
+                "Boekdatum": [1735689600000, 1739620800000],
+                "Periode": ["1", "2"],
+                "Code1": ["010", "020"],
+                "Omschrijving": ["Eerste", "Tweede"],
+                "Saldo": ["1.5", "n/a"],
+                "Factuurnummer": [None, "F1"],
+                "Debet": [1.5, 0.0],
+            }
+        )
+
+        con = duckdb.connect()
+        try:
+            con.register("source", source)
+            result = con.execute(build_transactions_query("source"))
+            columns = [d[0] for d in result.description]
+            rows = result.fetchall()
+        finally:
+            con.close()
+
+        assert columns == list(TRANSACTIONS_SCHEMA)
+        assert rows == [
+            ("Adm", "0010", "Kas", "M", 12, dates[0], "1", "010", "Eerste", 1.5, None),
+            ("Adm", "1234", "Bank", "B", None, dates[1], "2", "020", "Tweede", None, "F1"),
+        ]
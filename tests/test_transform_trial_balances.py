@@ -0,0 +1,102 @@
+"""Tests for the trial balance transformation."""
+
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from scripts.transform_trial_balances import (
+    build_trial_balances_query,
+    load_trial_balances,
+    parse_period_column,
+)
+
+
+class TestBuildTrialBalancesQuery:
+    """Tests for build_trial_balances_query function."""
+
+    def test_unpivot_signs_and_profit_rows(self):
+        """Test NULL periods are skipped, signs follow Code1 and BAS totals become 9999 rows."""
+        source = pa.table(
+            {
+                "CodeGrootboekrekening": [10, 600, 8000],
+                "NaamAdministratie": ["Adm"] * 3,
+                # Not a number: TRY_CAST falls back to NULL
+                "CodeRelatiekostenplaats": ["5", "abc", None],
+                "NaamRelatiekostenplaats": [None, None, None],
+                "CodeDimensietype": ["BAS", "BAS", "W&V"],
+                # Activa, passiva and expenses
+                "CodeRapportagestructuurgroep1": [10, 60, 520],
+                "Openingsbalans2025": [100.0, -40.0, None],
+                "januari2025": [None, 20.0, 30.0],
+            }
+        )
+        period_columns = [
+            (col, *parse_period_column(col)) for col in ("Openingsbalans2025", "januari2025")
+        ]
+
+        con = duckdb.connect()
+        try:
+            con.register("source", source)
+            rows = con.execute(f"""
+                SELECT CodeGrootboekrekening, CodeRelatiekostenplaats, JaarPeriode, Value, DisplayValue
+                FROM ({build_trial_balances_query("source", period_columns)})
+                ORDER BY JaarPeriode, CodeGrootboekrekening
+            """).fetchall()
+            last_dates = con.execute(f"""
+                SELECT DISTINCT JaarPeriode, LastDate
+                FROM ({build_trial_balances_query("source", period_columns)})
+                ORDER BY JaarPeriode
+            """).fetchall()
+        finally:
+            con.close()
+
+        assert rows == [
+            ("0010", 5, "2025-00", 100.0, 100.0),
+            ("0600", None, "2025-00", -40.0, 40.0),
+            # Profit rows sum only the BAS accounts of each period
+            ("9999", None, "2025-00", -60.0, 60.0),
+            ("0600", None, "2025-01", 20.0, -20.0),
+            ("8000", None, "2025-01", 30.0, -30.0),
+            ("9999", None, "2025-01", -20.0, 20.0),
+        ]
+        assert last_dates == [("2025-00", datetime(2025, 1, 1)), ("2025-01", datetime(2025, 1, 31))]
+
+
+class TestLoadTrialBalances:
+    """Tests for load_trial_balances function."""
+
+    def test_chunks_with_different_types(self, tmp_path):
+        """Test chunks whose columns infer different Arrow types load together."""
+        path = tmp_path / "trial_balances.xlsx"
+        pd.DataFrame(
+            {
+                "CodeGrootboekrekening": [10, 20, 30, 40],
+                "NaamAdministratie": ["Adm"] * 4,
+                # int64 in the first chunk, string in the second
+                "CodeRelatiekostenplaats": [1, 2, "x", None],
+                # null in the first chunk, double in the second
+                "NaamRelatiekostenplaats": [None, None, "Kpl", None],
+                "CodeDimensietype": ["BAS"] * 4,
+                "CodeRapportagestructuurgroep1": [10, 10, 60, 60],
+                "januari2025": [None, None, 5.5, 7.0],
+            }
+        ).to_excel(path, index=False)
+
+        con = duckdb.connect()
+        try:
+            # 2 fact rows for januari plus 1 profit row
+            assert load_trial_balances(con, path, chunk_size=2) == 3
+            rows = con.execute("""
+                SELECT CodeGrootboekrekening, CodeRelatiekostenplaats, NaamRelatiekostenplaats, Value
+                FROM fct_TrialBalances
+                ORDER BY CodeGrootboekrekening
+            """).fetchall()
+            assert rows == [
+                ("0030", None, "Kpl", 5.5),
+                ("0040", None, None, 7.0),
+                ("9999", None, None, -12.5),
+            ]
+        finally:
+            con.close()
@@ -1,9 +1,21 @@
 """Tests for shared utility functions."""
 
+import duckdb
 import pandas as pd
 import pytest
 
-from scripts.utils import pad_account_code
+from scripts.utils import (
+    apply_schema,
+    connect_duckdb,
+    estimated_row_count,
+    iter_excel_chunks,
+    open_duckdb,
+    pad_account_code,
+    pad_account_code_sql,
+    register_dataframe,
+    validate_schema,
+    write_to_duckdb,
+)
 
 
 class TestPadAccountCode:
@@ -43,3 +55,279 @@ class TestPadAccountCode:
         result = pad_account_code(codes)
         expected = pd.Series(["0010", "0100", "1000"])
         pd.testing.assert_series_equal(result, expected)
+
+    def test_preserves_index_and_name(self):
+        """Test the padded Series keeps the input index and name."""
+        codes = pd.Series([10, 100], index=[5, 7], name="CodeGrootboekrekening")
+        result = pad_account_code(codes)
+        expected = pd.Series(["0010", "0100"], index=[5, 7], name="CodeGrootboekrekening")
+        pd.testing.assert_series_equal(result, expected)
+
+
+class TestPadAccountCodeSql:
+    """Tests for pad_account_code_sql function."""
+
+    def test_matches_pandas_padding(self):
+        """Test SQL padding gives the same result as pad_account_code."""
+        codes = pd.Series([10, 100, 1000, 12345])
+        con = duckdb.connect()
+        try:
+            con.register("codes", pd.DataFrame({"code": codes}))
+            result = con.execute(f"SELECT {pad_account_code_sql('code')} AS code FROM codes").df()
+        finally:
+            con.close()
+        assert result["code"].tolist() == pad_account_code(codes).tolist()
+
+    def test_string_codes(self):
+        """Test padding string codes and passing NULLs through."""
+        result = duckdb.sql(
+            f"SELECT {pad_account_code_sql('code')} FROM (VALUES ('25'), ('99999'), (NULL)) t(code)"
+        ).fetchall()
+        assert result == [("0025",), ("99999",), (None,)]
+
+    def test_custom_width(self):
+        """Test padding to a width other than 4 (e.g. 3-digit Code1)."""
+        result = duckdb.sql(
+            f"SELECT {pad_account_code_sql('code', width=3)} FROM (VALUES (6), (60), (1000)) t(code)"
+        ).fetchall()
+        assert result == [("006",), ("060",), ("1000",)]
+
+
+class TestConnectDuckdb:
+    """Tests for connect_duckdb function."""
+
+    def test_bulk_write_settings(self):
+        """Test connections are opened with the shared ETL settings."""
+        con = connect_duckdb()
+        try:
+            setting = con.execute("SELECT current_setting('preserve_insertion_order')").fetchone()
+            assert setting[0] is False
+        finally:
+            con.close()
+
+    def test_memory_limit(self):
+        """Test an explicit memory limit is applied to the connection."""
+        con = connect_duckdb(memory_limit="1GiB")
+        try:
+            setting = con.execute("SELECT current_setting('memory_limit')").fetchone()
+            assert setting[0] == "1.0 GiB"
+        finally:
+            con.close()
+
+    def test_creates_database_file(self, tmp_path):
+        """Test connecting to a path creates a database file there."""
+        db_path = tmp_path / "test.db"
+        connect_duckdb(db_path).close()
+        assert db_path.exists()
+
+
+class TestRegisterDataframe:
+    """Tests for register_dataframe function."""
+
+    def test_registers_typed_frame(self):
+        """Test typed columns are queryable with their types preserved."""
+        con = duckdb.connect()
+        df = pd.DataFrame({"code": ["10", "20"], "value": [1.5, 2.5]})
+        register_dataframe(con, "typed", df)
+        assert con.execute("SELECT SUM(value) FROM typed").fetchone()[0] == 4.0
+        assert con.execute("SELECT typeof(code) FROM typed LIMIT 1").fetchone()[0] == "VARCHAR"
+
+    def test_mixed_object_column_falls_back(self):
+        """Test mixed-type object columns still register (pandas scan fallback)."""
+        con = duckdb.connect()
+        df = pd.DataFrame({"mixed": pd.Series(["F1", 123, None], dtype=object)})
+        register_dataframe(con, "mixed", df)
+        assert con.execute("SELECT COUNT(*) FROM mixed").fetchone()[0] == 3
+
+
+class TestApplySchema:
+    """Tests for apply_schema function."""
+
+    def test_applies_types(self):
+        """Test each supported schema type is applied."""
+        df = pd.DataFrame(
+            {
+                "code": [10, 20],
+                "value": ["1.5", "2.5"],
+                "date": ["2025-01-01", "2025-01-02"],
+                "nullable_int": [1, None],
+            }
+        )
+        schema = {
+            "code": "str",
+            "value": "float64",
+            "date": "datetime64[ns]",
+            "nullable_int": "Int64",
+        }
+        result = apply_schema(df, schema)
+        assert result["code"].tolist() == ["10", "20"]
+        assert result["value"].dtype == "float64"
+        assert pd.api.types.is_datetime64_any_dtype(result["date"])
+        assert str(result["nullable_int"].dtype) == "Int64"
+        assert list(result.columns) == list(df.columns)
+
+    def test_does_not_modify_input(self):
+        """Test the input DataFrame keeps its original types and values."""
+        df = pd.DataFrame({"code": [10, 20], "value": ["1.5", "x"]})
+        apply_schema(df, {"code": "str", "value": "float64"})
+        assert df["code"].tolist() == [10, 20]
+        assert df["value"].tolist() == ["1.5", "x"]
+
+    def test_copy_false_converts_in_place(self):
+        """Test copy=False converts the given DataFrame and returns it."""
+        df = pd.DataFrame({"code": [10, 20], "value": ["1.5", "x"]})
+        result = apply_schema(df, {"code": "str", "value": "float64"}, copy=False)
+        assert result is df
+        assert df["code"].tolist() == ["10", "20"]
+        assert df["value"].dtype == "float64"
+
+    def test_invalid_values_are_coerced(self):
+        """Test unparseable numbers become NaN instead of raising."""
+        df = pd.DataFrame({"value": ["1.5", "not a number"]})
+        result = apply_schema(df, {"value": "float64"})
+        assert result["value"].iloc[0] == 1.5
+        assert pd.isna(result["value"].iloc[1])
+
+    def test_nullable_int_from_numbers_and_strings(self):
+        """Test Int64 keeps NULLs for numeric input and coerces strings."""
+        df = pd.DataFrame({"num": [1.0, None, 3.0], "text": ["1", "x", None]}, index=[5, 6, 7])
+        result = apply_schema(df, {"num": "Int64", "text": "Int64"})
+        assert result["num"].tolist() == [1, pd.NA, 3]
+        assert result["text"].tolist() == [1, pd.NA, pd.NA]
+        assert str(result["num"].dtype) == "Int64"
+        assert result["num"].index.tolist() == [5, 6, 7]
+
+
+class TestValidateSchema:
+    """Tests for validate_schema function."""
+
+    def test_matching_schema(self):
+        """Test a frame matching the schema is valid; extra columns are allowed."""
+        df = pd.DataFrame({"code": pd.Series(["10"], dtype=object), "value": [1.5], "extra": [1]})
+        assert validate_schema(df, {"code": "str", "value": "float64"})
+
+    def test_reports_missing_and_mismatched(self, capsys):
+        """Test missing columns and type mismatches each make the schema invalid."""
+        df = pd.DataFrame({"value": [1.5]})
+        assert not validate_schema(df, {"code": "str", "value": "int64"})
+        output = capsys.readouterr().out
+        assert "Missing required columns: ['code']" in output
+        assert "Type mismatch for 'value': expected int64, got float64" in output
+
+    def test_strict_raises(self):
+        """Test strict mode raises ValueError on the first issue."""
+        with pytest.raises(ValueError, match="Type mismatch"):
+            validate_schema(pd.DataFrame({"value": [1.5]}), {"value": "int64"}, strict=True)
+
+
+class TestIterExcelChunks:
+    """Tests for iter_excel_chunks function."""
+
+    @pytest.fixture
+    def workbook(self, tmp_path):
+        """Write a small workbook with codes, mixed values and empty cells."""
+        path = tmp_path / "dump.xlsx"
+        pd.DataFrame(
+            {
+                "Code": [45, 100, 1300, 8000, 10],
+                "Mixed": ["F1", 123, None, "F2", 7],
+                "Dropped": [1, 2, 3, 4, 5],
+            }
+        ).to_excel(path, index=False)
+        return path
+
+    def test_chunks_rows(self, workbook):
+        """Test rows are split into chunks of at most chunk_size."""
+        chunks = list(iter_excel_chunks(workbook, ["Code"], chunk_size=2))
+        assert [chunk.num_rows for chunk in chunks] == [2, 2, 1]
+
+    def test_selects_columns_and_normalises_cells(self, workbook):
+        """Test column selection, integral floats as ints and empty cells as NULL."""
+        (chunk,) = iter_excel_chunks(workbook, ["Mixed", "Code"])
+        assert chunk.column_names == ["Mixed", "Code"]
+        assert chunk.column("Code").to_pylist() == [45, 100, 1300, 8000, 10]
+        assert chunk.column("Mixed").to_pylist() == ["F1", "123", None, "F2", "7"]
+
+    def test_callable_columns(self, workbook):
+        """Test a callable selects matching header names in sheet order."""
+        (chunk,) = iter_excel_chunks(workbook, lambda col: col != "Mixed")
+        assert chunk.column_names == ["Code", "Dropped"]
+
+    def test_missing_column(self, workbook):
+        """Test requesting an unknown column raises ValueError."""
+        with pytest.raises(ValueError, match="Missing required columns"):
+            list(iter_excel_chunks(workbook, ["Code", "Saldo"]))
+
+
+class TestEstimatedRowCount:
+    """Tests for estimated_row_count function."""
+
+    def test_reads_catalog_count(self, tmp_path):
+        """Test the row count of a table in the current and an attached database."""
+        con = connect_duckdb(str(tmp_path / "main.db"))
+        try:
+            con.execute("CREATE TABLE t AS SELECT * FROM range(7)")
+            con.execute(f"ATTACH '{tmp_path / 'other.db'}' AS other")
+            con.execute("CREATE TABLE other.t AS SELECT * FROM range(3)")
+            assert estimated_row_count(con, "t") == 7
+            assert estimated_row_count(con, "t", "other") == 3
+        finally:
+            con.close()
+
+
+class TestWriteToDuckdb:
+    """Tests for write_to_duckdb function."""
+
+    def test_replace_returns_row_count(self, tmp_path):
+        """Test replace mode writes the frame and returns its row count."""
+        db_path = tmp_path / "out" / "test.db"
+        df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        assert write_to_duckdb(df, str(db_path), "my_table") == 3
+        assert write_to_duckdb(df.head(1), str(db_path), "my_table") == 1
+
+    def test_append_matches_columns_by_name(self, tmp_path):
+        """Test append mode inserts by column name, not position."""
+        db_path = str(tmp_path / "test.db")
+        write_to_duckdb(pd.DataFrame({"a": [1], "b": ["x"]}), db_path, "t")
+        rows = write_to_duckdb(
+            pd.DataFrame({"b": ["y"], "a": [2]}), db_path, "t", if_exists="append"
+        )
+        assert rows == 2
+        con = duckdb.connect(db_path)
+        try:
+            assert con.execute("SELECT a, b FROM t ORDER BY a").fetchall() == [(1, "x"), (2, "y")]
+        finally:
+            con.close()
+
+    def test_append_creates_missing_table(self, tmp_path):
+        """Test append mode creates the table first and quotes its name."""
+        db_path = str(tmp_path / "test.db")
+        df = pd.DataFrame({"a": [1, 2]})
+        assert write_to_duckdb(df, db_path, "my table", if_exists="append") == 2
+        assert write_to_duckdb(df, db_path, "my table", if_exists="append") == 4
+
+    def test_reuses_open_connection(self, tmp_path):
+        """Test several writes share a connection from open_duckdb."""
+        db_path = tmp_path / "out" / "shared.db"
+        with open_duckdb(str(db_path)) as con:
+            assert write_to_duckdb(pd.DataFrame({"a": [1, 2]}), None, "t1", con=con) == 2
+            assert write_to_duckdb(pd.DataFrame({"b": ["x"]}), None, "t2", con=con) == 1
+            source_views = "SELECT COUNT(*) FROM duckdb_views() WHERE view_name = 'source_df'"
+            assert con.execute(source_views).fetchone()[0] == 0
+        con = duckdb.connect(str(db_path))
+        try:
+            assert con.execute("SELECT COUNT(*) FROM t1, t2").fetchone()[0] == 2
+        finally:
+            con.close()
+
+    def test_invalid_if_exists(self, tmp_path):
+        """Test an unknown if_exists value raises ValueError."""
+        with pytest.raises(ValueError, match="if_exists"):
+            write_to_duckdb(
+                pd.DataFrame({"a": [1]}), str(tmp_path / "t.db"), "t", if_exists="merge"
+            )
+
+    def test_requires_path_or_connection(self):
+        """Test writing without output_path or con raises ValueError."""
+        with pytest.raises(ValueError, match="output_path"):
+            write_to_duckdb(pd.DataFrame({"a": [1]}), None, "t")
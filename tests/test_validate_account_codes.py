@@ -0,0 +1,47 @@
+"""Tests for account code validation."""
+
+import duckdb
+import pandas as pd
+
+from scripts.validate_account_codes import read_account_codes, validate_codes
+
+
+class TestReadAccountCodes:
+    """Tests for read_account_codes function."""
+
+    def test_chunks_with_different_types(self, tmp_path):
+        """Test chunks whose codes infer different Arrow types are combined."""
+        path = tmp_path / "codes.xlsx"
+        pd.DataFrame(
+            {
+                # int64 in the first chunk, string in the second, null then int64 in the third
+                "CodeGrootboekrekening": [10, 20, "0020", "30", None, 10],
+            }
+        ).to_excel(path, index=False)
+
+        con = duckdb.connect()
+        try:
+            assert read_account_codes(con, path, "codes_table", chunk_size=2) == 6
+            rows = con.execute("SELECT code FROM codes_table ORDER BY code").fetchall()
+            assert rows == [("0010",), ("0020",), ("0030",)]
+        finally:
+            con.close()
+
+
+class TestValidateCodes:
+    """Tests for validate_codes function."""
+
+    def test_missing_extra_and_common(self):
+        """Test codes are split into missing, extra and common sets."""
+        con = duckdb.connect()
+        try:
+            con.execute("CREATE TABLE transaction_codes (code VARCHAR)")
+            con.execute("INSERT INTO transaction_codes VALUES ('0010'), ('0020'), ('0030')")
+            con.execute("CREATE TABLE trial_balance_codes (code VARCHAR)")
+            con.execute("INSERT INTO trial_balance_codes VALUES ('0020'), ('0030'), ('0040')")
+            missing, extra, common = validate_codes(con)
+            assert missing == {"0010"}
+            assert extra == {"0040"}
+            assert common == {"0020", "0030"}
+        finally:
+            con.close()